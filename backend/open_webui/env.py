@@ -421,6 +421,33 @@ OFFLINE_MODE = os.environ.get("OFFLINE_MODE", "false").lower() == "true"
 if OFFLINE_MODE:
     os.environ["HF_HUB_OFFLINE"] = "1"
 
+####################################
+# RAG
+####################################
+
+# Number of threads used to run RAG source retrieval for chat requests. Retrieval mostly
+# waits on embedding, reranking and vector DB calls, so this is sized well above the CPU count.
+try:
+    RAG_SOURCES_THREAD_POOL_SIZE = int(
+        os.environ.get("RAG_SOURCES_THREAD_POOL_SIZE") or 64
+    )
+except ValueError:
+    RAG_SOURCES_THREAD_POOL_SIZE = 64
+
+# Maximum number of embeddings kept in the in-memory embedding cache (0 disables it)
+try:
+    RAG_EMBEDDING_CACHE_SIZE = int(os.environ.get("RAG_EMBEDDING_CACHE_SIZE") or 1000)
+except ValueError:
+    RAG_EMBEDDING_CACHE_SIZE = 1000
+
+# Embedding calls with more texts than this (e.g. document ingestion) bypass the cache
+try:
+    RAG_EMBEDDING_CACHE_MAX_BATCH_SIZE = int(
+        os.environ.get("RAG_EMBEDDING_CACHE_MAX_BATCH_SIZE") or 16
+    )
+except ValueError:
+    RAG_EMBEDDING_CACHE_MAX_BATCH_SIZE = 16
+
 ####################################
 # AUDIT LOGGING
 ####################################
@@ -1,13 +1,27 @@
 import logging
 import os
+import threading
 import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from http.cookiejar import DefaultCookiePolicy
 from typing import Optional, Union
 
 import asyncio
-import requests
 import hashlib
+import requests
+import numpy as np
+from requests.adapters import HTTPAdapter
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
 
 from huggingface_hub import snapshot_download
+from huggingface_hub.constants import HF_HUB_CACHE
 from langchain.retrievers import ContextualCompressionRetriever, EnsembleRetriever
 from langchain_community.retrievers import BM25Retriever
 from langchain_core.documents import Document
@@ -15,7 +29,7 @@ from langchain_core.documents import Document
 
 from open_webui.config import VECTOR_DB
 from open_webui.retrieval.vector.connector import VECTOR_DB_CLIENT
-from open_webui.utils.misc import get_last_user_message, calculate_sha256_string
+from open_webui.retrieval.vector.main import GetResult
 
 from open_webui.models.users import UserModel
 from open_webui.models.files import Files
@@ -24,11 +38,37 @@ from open_webui.env import (
     SRC_LOG_LEVELS,
     OFFLINE_MODE,
     ENABLE_FORWARD_USER_INFO_HEADERS,
+    RAG_EMBEDDING_CACHE_SIZE,
+    RAG_EMBEDDING_CACHE_MAX_BATCH_SIZE,
+    RAG_SOURCES_THREAD_POOL_SIZE,
 )
 
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["RAG"])
 
+# Shared HTTP session for embedding requests, so connections (and TLS sessions) to
+# the embedding API are kept alive and reused instead of reopened on every call.
+# Its cookie jar rejects all cookies, so nothing set for one user's call is replayed
+# on calls made for other users. Query embeddings are requested from the RAG sources
+# executor threads, so the per-host pool is sized to match it; otherwise connections
+# beyond the pool size are opened and discarded on every call under load.
+_EMBEDDING_SESSION = requests.Session()
+_EMBEDDING_SESSION.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+_EMBEDDING_SESSION.mount(
+    "http://", HTTPAdapter(pool_maxsize=max(RAG_SOURCES_THREAD_POOL_SIZE, 1))
+)
+_EMBEDDING_SESSION.mount(
+    "https://", HTTPAdapter(pool_maxsize=max(RAG_SOURCES_THREAD_POOL_SIZE, 1))
+)
+
+# Shared worker pool for I/O bound retrieval calls (vector DB searches, etc.), so
+# requests don't pay for spawning and tearing down threads on every query.
+# Tasks running on this pool must not submit to it and wait, to avoid deadlocks.
+_RETRIEVAL_POOL = ThreadPoolExecutor(
+    max_workers=min(32, (os.cpu_count() or 1) * 4),
+    thread_name_prefix="owui-retrieval",
+)
+
 
 from typing import Any
 
@@ -68,6 +108,37 @@ class VectorSearchRetriever(BaseRetriever):
         return results
 
 
+@dataclass(slots=True)
+class QueryResult:
+    # Retrieval results for a single query, stored as parallel columns (SoA)
+    documents: list[str]
+    metadatas: list[Any]
+    distances: Optional[np.ndarray] = None
+    ids: Optional[list[str]] = None
+
+    @classmethod
+    def from_backend(cls, data: Union[dict, GetResult]) -> "QueryResult":
+        # Unwrap the single-query `[[...]]` nesting used by the vector DB clients.
+        # Pydantic results are read through attributes to avoid a model_dump() copy.
+        if isinstance(data, dict):
+            documents, metadatas = data["documents"], data["metadatas"]
+            distances, ids = data.get("distances"), data.get("ids")
+        else:
+            documents, metadatas = data.documents, data.metadatas
+            distances, ids = getattr(data, "distances", None), data.ids
+
+        return cls(
+            documents=documents[0],
+            metadatas=metadatas[0],
+            distances=(
+                np.asarray(distances[0], dtype=np.float64)
+                if distances is not None
+                else None
+            ),
+            ids=ids[0] if ids is not None else None,
+        )
+
+
 def query_doc(
     collection_name: str, query_embedding: list[float], k: int, user: UserModel = None
 ):
@@ -100,6 +171,15 @@ def get_doc(collection_name: str, user: UserModel = None):
         raise e
 
 
+def create_bm25_retriever(collection_result: GetResult, k: int) -> BM25Retriever:
+    bm25_retriever = BM25Retriever.from_texts(
+        texts=collection_result.documents[0],
+        metadatas=collection_result.metadatas[0],
+    )
+    bm25_retriever.k = k
+    return bm25_retriever
+
+
 def query_doc_with_hybrid_search(
     collection_name: str,
     query: str,
@@ -107,15 +187,13 @@ def query_doc_with_hybrid_search(
     k: int,
     reranking_function,
     r: float,
+    bm25_retriever: Optional[BM25Retriever] = None,
 ) -> dict:
     try:
-        result = VECTOR_DB_CLIENT.get(collection_name=collection_name)
-
-        bm25_retriever = BM25Retriever.from_texts(
-            texts=result.documents[0],
-            metadatas=result.metadatas[0],
-        )
-        bm25_retriever.k = k
+        if bm25_retriever is None:
+            bm25_retriever = create_bm25_retriever(
+                VECTOR_DB_CLIENT.get(collection_name=collection_name), k
+            )
 
         vector_search_retriever = VectorSearchRetriever(
             collection_name=collection_name,
@@ -153,16 +231,16 @@ def query_doc_with_hybrid_search(
         raise e
 
 
-def merge_get_results(get_results: list[dict]) -> dict:
+def merge_get_results(get_results: list[QueryResult]) -> dict:
     # Initialize lists to store combined data
     combined_documents = []
     combined_metadatas = []
     combined_ids = []
 
-    for data in get_results:
-        combined_documents.extend(data["documents"][0])
-        combined_metadatas.extend(data["metadatas"][0])
-        combined_ids.extend(data["ids"][0])
+    for result in get_results:
+        combined_documents.extend(result.documents)
+        combined_metadatas.extend(result.metadatas)
+        combined_ids.extend(result.ids)
 
     # Create the output dictionary
     result = {
@@ -174,57 +252,127 @@ def merge_get_results(get_results: list[dict]) -> dict:
     return result
 
 
+def _document_hash(document: str) -> int:
+    # Non-cryptographic 64-bit fingerprint used to deduplicate documents
+    if xxhash is not None:
+        return xxhash.xxh3_64_intdigest(document.encode())
+    return hash(document) & 0xFFFFFFFFFFFFFFFF
+
+
+def _topk_indices(sort_keys: np.ndarray, k: int) -> np.ndarray:
+    # Indices of the k smallest keys in ascending order, ties broken by position.
+    # Uses an O(n) partition instead of sorting every key.
+    if k <= 0:
+        return np.arange(0)
+
+    if k < len(sort_keys):
+        # Keep everything strictly better than the k-th key, then fill up with the
+        # earliest rows tied with it so ties are resolved deterministically
+        kth_key = np.partition(sort_keys, k - 1)[k - 1]
+        better = np.flatnonzero(sort_keys < kth_key)
+        tied = np.flatnonzero(sort_keys == kth_key)[: k - len(better)]
+        top_k = np.concatenate((better, tied))
+    else:
+        top_k = np.arange(len(sort_keys))
+
+    return top_k[np.lexsort((top_k, sort_keys[top_k]))]
+
+
+def _topk_dedup(
+    distances: np.ndarray, hashes: np.ndarray, k: int, reverse: bool
+) -> np.ndarray:
+    # Deduplicate rows by hash, keeping the first occurrence
+    _, first_indices = np.unique(hashes, return_index=True)
+    unique_indices = np.sort(first_indices)
+
+    # Select only the top k rows based on distances
+    sort_keys = distances[unique_indices]
+    if reverse:
+        sort_keys = -sort_keys
+    return unique_indices[_topk_indices(sort_keys, k)]
+
+
 def merge_and_sort_query_results(
-    query_results: list[dict], k: int, reverse: bool = False
+    query_results: list[QueryResult], k: int, reverse: bool = False
 ) -> dict:
+    # Fast path: a single result that already fits in k, is sorted in the requested
+    # order and holds no duplicates (the common single query/collection case)
+    if len(query_results) == 1 and k > 0:
+        result = query_results[0]
+        distance_steps = np.diff(result.distances)
+        if (
+            len(result.documents) <= k
+            and bool(np.all(distance_steps <= 0 if reverse else distance_steps >= 0))
+            and all(isinstance(document, str) for document in result.documents)
+            and len(set(result.documents)) == len(result.documents)
+        ):
+            return {
+                "distances": [result.distances.tolist()],
+                "documents": [list(result.documents)],
+                "metadatas": [list(result.metadatas)],
+            }
+
     # Initialize lists to store combined data
-    combined = []
-    seen_hashes = set()  # To store unique document hashes
-
-    for data in query_results:
-        distances = data["distances"][0]
-        documents = data["documents"][0]
-        metadatas = data["metadatas"][0]
-
-        for distance, document, metadata in zip(distances, documents, metadatas):
-            if isinstance(document, str):
-                doc_hash = hashlib.md5(
-                    document.encode()
-                ).hexdigest()  # Compute a hash for uniqueness
-
-                if doc_hash not in seen_hashes:
-                    seen_hashes.add(doc_hash)
-                    combined.append((distance, document, metadata))
-
-    # Sort the list based on distances
-    combined.sort(key=lambda x: x[0], reverse=reverse)
-
-    # Slice to keep only the top k elements
-    sorted_distances, sorted_documents, sorted_metadatas = (
-        zip(*combined[:k]) if combined else ([], [], [])
+    combined_distances = []
+    combined_documents = []
+    combined_metadatas = []
+
+    for result in query_results:
+        valid = [
+            idx
+            for idx, document in enumerate(result.documents)
+            if isinstance(document, str)
+        ]
+        if len(valid) == len(result.documents):
+            combined_distances.append(result.distances)
+            combined_documents.extend(result.documents)
+            combined_metadatas.extend(result.metadatas)
+        else:
+            combined_distances.append(result.distances[valid])
+            combined_documents.extend(result.documents[idx] for idx in valid)
+            combined_metadatas.extend(result.metadatas[idx] for idx in valid)
+
+    if not combined_documents or k <= 0:
+        return {"distances": [[]], "documents": [[]], "metadatas": [[]]}
+
+    distances = np.concatenate(combined_distances)
+    doc_hashes = np.fromiter(
+        (_document_hash(document) for document in combined_documents),
+        dtype=np.uint64,
+        count=len(combined_documents),
     )
+    top_k = _topk_dedup(distances, doc_hashes, k, reverse)
 
     # Create and return the output dictionary
     return {
-        "distances": [list(sorted_distances)],
-        "documents": [list(sorted_documents)],
-        "metadatas": [list(sorted_metadatas)],
+        "distances": [distances[top_k].tolist()],
+        "documents": [[combined_documents[i] for i in top_k.tolist()]],
+        "metadatas": [[combined_metadatas[i] for i in top_k.tolist()]],
     }
 
 
 def get_all_items_from_collections(collection_names: list[str]) -> dict:
     results = []
 
-    for collection_name in collection_names:
-        if collection_name:
-            try:
-                result = get_doc(collection_name=collection_name)
-                if result is not None:
-                    results.append(result.model_dump())
-            except Exception as e:
-                log.exception(f"Error when querying the collection: {e}")
-        else:
-            pass
+    def process_collection(collection_name):
+        try:
+            result = get_doc(collection_name=collection_name)
+            if result is not None:
+                return QueryResult.from_backend(result)
+        except Exception as e:
+            log.exception(f"Error when querying the collection: {e}")
+        return None
+
+    # Fetch the collections concurrently, collecting in order to keep the merge stable
+    futures = [
+        _RETRIEVAL_POOL.submit(process_collection, collection_name)
+        for collection_name in collection_names
+        if collection_name
+    ]
+    for future in futures:
+        result = future.result()
+        if result is not None:
+            results.append(result)
 
     return merge_get_results(results)
 
@@ -236,22 +384,39 @@ def query_collection(
     k: int,
 ) -> dict:
     results = []
-    for query in queries:
-        query_embedding = embedding_function(query)
-        for collection_name in collection_names:
-            if collection_name:
-                try:
-                    result = query_doc(
-                        collection_name=collection_name,
-                        k=k,
-                        query_embedding=query_embedding,
-                    )
-                    if result is not None:
-                        results.append(result.model_dump())
-                except Exception as e:
-                    log.exception(f"Error when querying the collection: {e}")
-            else:
-                pass
+    # Embed all queries in a single (batched) call instead of one call per query
+    query_embeddings = embedding_function(queries)
+
+    def process_query(collection_name, query_embedding):
+        try:
+            result = query_doc(
+                collection_name=collection_name,
+                k=k,
+                query_embedding=query_embedding,
+            )
+            if result is not None:
+                return QueryResult.from_backend(result)
+        except Exception as e:
+            log.exception(f"Error when querying the collection: {e}")
+        return None
+
+    tasks = [
+        (collection_name, query_embedding)
+        for query_embedding in query_embeddings
+        for collection_name in collection_names
+        if collection_name
+    ]
+
+    # Vector DB searches are I/O bound and independent, so run them concurrently
+    futures = [
+        _RETRIEVAL_POOL.submit(process_query, collection_name, query_embedding)
+        for collection_name, query_embedding in tasks
+    ]
+    # Collect in submission order to keep the merge deterministic
+    for future in futures:
+        result = future.result()
+        if result is not None:
+            results.append(result)
 
     if VECTOR_DB == "chroma":
         # Chroma uses unconventional cosine similarity, so we don't need to reverse the results
@@ -273,6 +438,10 @@ def query_collection_with_hybrid_search(
     error = False
     for collection_name in collection_names:
         try:
+            # Fetch and tokenize the collection once, not once per query
+            bm25_retriever = create_bm25_retriever(
+                VECTOR_DB_CLIENT.get(collection_name=collection_name), k
+            )
             for query in queries:
                 result = query_doc_with_hybrid_search(
                     collection_name=collection_name,
@@ -281,8 +450,9 @@ def query_collection_with_hybrid_search(
                     k=k,
                     reranking_function=reranking_function,
                     r=r,
+                    bm25_retriever=bm25_retriever,
                 )
-                results.append(result)
+                results.append(QueryResult.from_backend(result))
         except Exception as e:
             log.exception(
                 "Error when querying the collection with " f"hybrid_search: {e}"
@@ -302,6 +472,66 @@ def query_collection_with_hybrid_search(
         return merge_and_sort_query_results(results, k=k, reverse=True)
 
 
+def cache_embedding_function(
+    func,
+    model: str,
+    max_size: int = RAG_EMBEDDING_CACHE_SIZE,
+    max_batch_size: int = RAG_EMBEDDING_CACHE_MAX_BATCH_SIZE,
+):
+    # In-memory LRU cache keyed on (model, text); for list inputs only the texts
+    # that are not cached yet are sent to the underlying embedding function.
+    # Lists longer than max_batch_size (e.g. document ingestion) bypass the cache so
+    # they don't evict the query embeddings it is meant to keep.
+    if max_size <= 0:
+        return func
+
+    cache = OrderedDict()
+    lock = threading.Lock()
+
+    def get_cache_key(text: str):
+        return (model, hashlib.blake2b(text.encode(), digest_size=16).digest())
+
+    def cached_func(query, user=None):
+        if isinstance(query, list) and len(query) > max_batch_size:
+            return func(query, user=user)
+
+        texts = query if isinstance(query, list) else [query]
+        keys = [get_cache_key(text) for text in texts]
+
+        # Embeddings are cached as read-only float32 arrays (a quarter of the memory
+        # of boxed floats) and handed out as fresh lists, so callers mutating a
+        # returned embedding can't corrupt later cache hits
+        embeddings = [None] * len(texts)
+        missing = {}  # cache key -> indices of texts still to be embedded
+        with lock:
+            for idx, key in enumerate(keys):
+                embedding = cache.get(key)
+                if embedding is None:
+                    missing.setdefault(key, []).append(idx)
+                else:
+                    cache.move_to_end(key)
+                    embeddings[idx] = embedding.tolist()
+
+        if missing:
+            missing_texts = [texts[indices[0]] for indices in missing.values()]
+            new_embeddings = func(missing_texts, user=user)
+
+            with lock:
+                for (key, indices), embedding in zip(missing.items(), new_embeddings):
+                    embedding = np.asarray(embedding, dtype=np.float32)
+                    embedding.flags.writeable = False
+                    for idx in indices:
+                        embeddings[idx] = embedding.tolist()
+                    cache[key] = embedding
+                    cache.move_to_end(key)
+                while len(cache) > max_size:
+                    cache.popitem(last=False)
+
+        return embeddings if isinstance(query, list) else embeddings[0]
+
+    return cached_func
+
+
 def get_embedding_function(
     embedding_engine,
     embedding_model,
@@ -311,7 +541,10 @@ def get_embedding_function(
     embedding_batch_size,
 ):
     if embedding_engine == "":
-        return lambda query, user=None: embedding_function.encode(query).tolist()
+        return cache_embedding_function(
+            lambda query, user=None: embedding_function.encode(query).tolist(),
+            embedding_model,
+        )
     elif embedding_engine in ["ollama", "openai"]:
         func = lambda query, user=None: generate_embeddings(
             engine=embedding_engine,
@@ -333,7 +566,10 @@ def get_embedding_function(
             else:
                 return func(query, user)
 
-        return lambda query, user=None: generate_multiple(query, user, func)
+        return cache_embedding_function(
+            lambda query, user=None: generate_multiple(query, user, func),
+            embedding_model,
+        )
     else:
         raise ValueError(f"Unknown embedding engine: {embedding_engine}")
 
@@ -353,7 +589,7 @@ def get_sources_from_files(
         f"files: {files} {queries} {embedding_function} {reranking_function} {full_context}"
     )
 
-    extracted_collections = []
+    extracted_collections = set()
     relevant_contexts = []
 
     for file in files:
@@ -379,10 +615,16 @@ def get_sources_from_files(
             if file.get("type") == "collection":
                 file_ids = file.get("data", {}).get("file_ids", [])
 
+                # Fetch all files of the collection in a single query
+                files_by_id = {
+                    file_object.id: file_object
+                    for file_object in Files.get_files_by_ids(file_ids)
+                }
+
                 documents = []
                 metadatas = []
                 for file_id in file_ids:
-                    file_object = Files.get_file_by_id(file_id)
+                    file_object = files_by_id.get(file_id)
 
                     if file_object:
                         documents.append(file_object.data.get("content", ""))
@@ -479,7 +721,7 @@ def get_sources_from_files(
                 except Exception as e:
                     log.exception(e)
 
-            extracted_collections.extend(collection_names)
+            extracted_collections.update(collection_names)
 
         if context:
             if "data" in file:
@@ -507,6 +749,26 @@ def get_sources_from_files(
     return sources
 
 
+@lru_cache(maxsize=64)
+def _get_local_model_snapshot_path(repo_id: str, cache_dir: Optional[str] = None):
+    # Read the snapshot for refs/main straight from the huggingface cache layout,
+    # falling back to huggingface_hub when it cannot be resolved that way.
+    # Lookups that raise are not cached, so models downloaded later are picked up.
+    repo_cache_dir = os.path.join(
+        cache_dir or HF_HUB_CACHE, "models--" + repo_id.replace("/", "--")
+    )
+    ref_path = os.path.join(repo_cache_dir, "refs", "main")
+    if os.path.isfile(ref_path):
+        with open(ref_path) as f:
+            snapshot_path = os.path.join(repo_cache_dir, "snapshots", f.read().strip())
+        if os.path.isdir(snapshot_path):
+            return snapshot_path
+
+    return snapshot_download(
+        repo_id=repo_id, cache_dir=cache_dir, local_files_only=True
+    )
+
+
 def get_model_path(model: str, update_model: bool = False):
     # Construct huggingface_hub kwargs with local_files_only to return the snapshot path
     cache_dir = os.getenv("SENTENCE_TRANSFORMERS_HOME")
@@ -540,7 +802,12 @@ def get_model_path(model: str, update_model: bool = False):
 
     # Attempt to query the huggingface_hub library to determine the local path and/or to update
     try:
-        model_repo_path = snapshot_download(**snapshot_kwargs)
+        if local_files_only:
+            model_repo_path = _get_local_model_snapshot_path(model, cache_dir)
+        else:
+            model_repo_path = snapshot_download(**snapshot_kwargs)
+            # The update may have moved refs/main to a new snapshot
+            _get_local_model_snapshot_path.cache_clear()
         log.debug(f"model_repo_path: {model_repo_path}")
         return model_repo_path
     except Exception as e:
@@ -556,7 +823,7 @@ def generate_openai_batch_embeddings(
     user: UserModel = None,
 ) -> Optional[list[list[float]]]:
     try:
-        r = requests.post(
+        r = _EMBEDDING_SESSION.post(
             f"{url}/embeddings",
             headers={
                 "Content-Type": "application/json",
@@ -589,7 +856,7 @@ def generate_ollama_batch_embeddings(
     model: str, texts: list[str], url: str, key: str = "", user: UserModel = None
 ) -> Optional[list[list[float]]]:
     try:
-        r = requests.post(
+        r = _EMBEDDING_SESSION.post(
             f"{url}/api/embed",
             headers={
                 "Content-Type": "application/json",
@@ -649,7 +916,6 @@ def generate_embeddings(engine: str, model: str, text: Union[str, list[str]], **
         return embeddings[0] if isinstance(text, str) else embeddings
 
 
-import operator
 from typing import Optional, Sequence
 
 from langchain_core.callbacks import Callbacks
@@ -679,28 +945,36 @@ class RerankCompressor(BaseDocumentCompressor):
                 [(query, doc.page_content) for doc in documents]
             )
         else:
-            from sentence_transformers import util
-
-            query_embedding = self.embedding_function(query)
-            document_embedding = self.embedding_function(
-                [doc.page_content for doc in documents]
+            query_embedding = np.asarray(
+                self.embedding_function(query), dtype=np.float32
+            )
+            document_embedding = np.asarray(
+                self.embedding_function([doc.page_content for doc in documents]),
+                dtype=np.float32,
+            ).reshape(len(documents), -1)
+
+            # Cosine similarity between the query and each document
+            query_embedding /= max(np.linalg.norm(query_embedding), 1e-12)
+            document_embedding /= np.maximum(
+                np.linalg.norm(document_embedding, axis=1, keepdims=True), 1e-12
             )
-            scores = util.cos_sim(query_embedding, document_embedding)[0]
+            scores = document_embedding @ query_embedding
 
-        docs_with_scores = list(zip(documents, scores.tolist()))
+        scores = np.asarray(scores, dtype=np.float64).reshape(-1)
         if self.r_score:
-            docs_with_scores = [
-                (d, s) for d, s in docs_with_scores if s >= self.r_score
-            ]
+            candidates = np.nonzero(scores >= self.r_score)[0]
+        else:
+            candidates = np.arange(len(scores))
+
+        # Select the top n candidates by descending score
+        candidates = candidates[_topk_indices(-scores[candidates], self.top_n)]
 
-        result = sorted(docs_with_scores, key=operator.itemgetter(1), reverse=True)
         final_results = []
-        for doc, doc_score in result[: self.top_n]:
-            metadata = doc.metadata
-            metadata["score"] = doc_score
+        for idx, doc_score in zip(candidates.tolist(), scores[candidates].tolist()):
+            doc = documents[idx]
             doc = Document(
                 page_content=doc.page_content,
-                metadata=metadata,
+                metadata={**doc.metadata, "score": doc_score},
             )
             final_results.append(doc)
         return final_results
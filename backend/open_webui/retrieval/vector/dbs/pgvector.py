@@ -288,6 +288,8 @@ class PgvectorClient:
         except Exception as e:
             log.exception(f"Error during search: {e}")
             return None
+        finally:
+            self.release_session()
 
     def query(
         self, collection_name: str, filter: Dict[str, Any], limit: Optional[int] = None
@@ -320,6 +322,8 @@ class PgvectorClient:
         except Exception as e:
             log.exception(f"Error during query: {e}")
             return None
+        finally:
+            self.release_session()
 
     def get(
         self, collection_name: str, limit: Optional[int] = None
@@ -344,6 +348,8 @@ class PgvectorClient:
         except Exception as e:
             log.exception(f"Error during get: {e}")
             return None
+        finally:
+            self.release_session()
 
     def delete(
         self,
@@ -385,6 +391,12 @@ class PgvectorClient:
     def close(self) -> None:
         pass
 
+    def release_session(self) -> None:
+        # Reads run on long-lived worker threads (e.g. the retrieval thread pool). Remove
+        # the thread-local session after each read so its transaction ends and the
+        # connection goes back to the pool instead of staying checked out for good.
+        self.session.remove()
+
     def has_collection(self, collection_name: str) -> bool:
         try:
             exists = (
@@ -397,6 +409,8 @@ class PgvectorClient:
         except Exception as e:
             log.exception(f"Error checking collection existence: {e}")
             return False
+        finally:
+            self.release_session()
 
     def delete_collection(self, collection_name: str) -> None:
         self.delete(collection_name)
@@ -0,0 +1,102 @@
+import numpy as np
+from langchain_core.documents import Document
+from open_webui.retrieval.utils import (
+    QueryResult,
+    RerankCompressor,
+    _topk_indices,
+    merge_and_sort_query_results,
+)
+
+
+def make_result(documents, distances):
+    return QueryResult(
+        documents=documents,
+        metadatas=[{"source": document} for document in documents],
+        distances=np.asarray(distances, dtype=np.float64),
+    )
+
+
+def test_topk_indices_orders_by_key():
+    keys = np.array([0.5, 0.1, 0.9, 0.3])
+    assert _topk_indices(keys, 2).tolist() == [1, 3]
+    assert _topk_indices(keys, 10).tolist() == [1, 3, 0, 2]
+    assert _topk_indices(keys, 0).tolist() == []
+
+
+def test_topk_indices_breaks_ties_by_position():
+    keys = np.array([0.2, 0.1, 0.2, 0.2, 0.0, 0.2])
+    # Only two of the four rows tied at 0.2 fit, the earliest ones win
+    assert _topk_indices(keys, 4).tolist() == [4, 1, 0, 2]
+    assert _topk_indices(keys, 6).tolist() == [4, 1, 0, 2, 3, 5]
+
+
+def test_merge_and_sort_keeps_first_occurrence():
+    results = [
+        make_result(["a", "b"], [0.9, 0.4]),
+        make_result(["b", "c"], [0.8, 0.7]),
+    ]
+    merged = merge_and_sort_query_results(results, k=3, reverse=True)
+    assert merged["documents"] == [["a", "c", "b"]]
+    assert merged["distances"] == [[0.9, 0.7, 0.4]]
+    # The metadata of "b" comes from its first occurrence, not its best score
+    assert merged["metadatas"] == [[{"source": "a"}, {"source": "c"}, {"source": "b"}]]
+
+
+def test_merge_and_sort_breaks_ties_by_position():
+    results = [
+        make_result(["a", "b"], [0.5, 0.5]),
+        make_result(["c", "d"], [0.5, 0.9]),
+    ]
+    merged = merge_and_sort_query_results(results, k=3, reverse=True)
+    assert merged["documents"] == [["d", "a", "b"]]
+
+    merged = merge_and_sort_query_results(results, k=2, reverse=False)
+    assert merged["documents"] == [["a", "b"]]
+
+
+def test_merge_and_sort_single_result():
+    merged = merge_and_sort_query_results(
+        [make_result(["a", "b", "a"], [0.1, 0.2, 0.3])], k=2
+    )
+    assert merged["documents"] == [["a", "b"]]
+    assert merged["distances"] == [[0.1, 0.2]]
+
+    merged = merge_and_sort_query_results([make_result([], [])], k=2)
+    assert merged == {"distances": [[]], "documents": [[]], "metadatas": [[]]}
+
+
+class MockReranker:
+    def __init__(self, scores):
+        self.scores = scores
+
+    def predict(self, pairs):
+        assert len(pairs) == len(self.scores)
+        return np.asarray(self.scores)
+
+
+def rerank(scores, top_n, r_score):
+    compressor = RerankCompressor(
+        embedding_function=None,
+        top_n=top_n,
+        reranking_function=MockReranker(scores),
+        r_score=r_score,
+    )
+    documents = [
+        Document(page_content=f"doc {idx}", metadata={"idx": idx})
+        for idx in range(len(scores))
+    ]
+    return compressor.compress_documents(documents, "query")
+
+
+def test_rerank_compressor_breaks_ties_by_position():
+    results = rerank([0.3, 0.8, 0.3, 0.8, 0.3], top_n=3, r_score=0.0)
+    assert [doc.metadata["idx"] for doc in results] == [1, 3, 0]
+    assert [doc.metadata["score"] for doc in results] == [0.8, 0.8, 0.3]
+
+
+def test_rerank_compressor_applies_relevance_threshold():
+    results = rerank([0.2, 0.6, 0.5, 0.9], top_n=10, r_score=0.5)
+    assert [doc.metadata["idx"] for doc in results] == [3, 1, 2]
+    assert [doc.page_content for doc in results] == ["doc 3", "doc 1", "doc 2"]
+
+    assert rerank([0.2, 0.4], top_n=10, r_score=0.5) == []
@@ -90,6 +90,7 @@ from open_webui.env import (
     GLOBAL_LOG_LEVEL,
     BYPASS_MODEL_ACCESS_CONTROL,
     ENABLE_REALTIME_CHAT_SAVE,
+    RAG_SOURCES_THREAD_POOL_SIZE,
 )
 from open_webui.constants import TASKS
 
@@ -98,6 +99,15 @@ logging.basicConfig(stream=sys.stdout, level=GLOBAL_LOG_LEVEL)
 log = logging.getLogger(__name__)
 log.setLevel(SRC_LOG_LEVELS["MAIN"])
 
+# Dedicated pool for offloading get_sources_from_files from the event loop. It is kept
+# apart from the loop's default executor (shared with e.g. image generation and capped
+# at min(32, cpu_count + 4) threads) so RAG chats don't queue behind unrelated work,
+# and apart from the retrieval pool, which get_sources_from_files itself waits on.
+RAG_SOURCES_EXECUTOR = ThreadPoolExecutor(
+    max_workers=max(RAG_SOURCES_THREAD_POOL_SIZE, 1),
+    thread_name_prefix="owui-rag-sources",
+)
+
 
 async def chat_completion_tools_handler(
     request: Request, body: dict, user: UserModel, models, tools
@@ -555,23 +565,22 @@ async def chat_completion_files_handler(
         try:
             # Offload get_sources_from_files to a separate thread
             loop = asyncio.get_running_loop()
-            with ThreadPoolExecutor() as executor:
-                sources = await loop.run_in_executor(
-                    executor,
-                    lambda: get_sources_from_files(
-                        request=request,
-                        files=files,
-                        queries=queries,
-                        embedding_function=lambda query: request.app.state.EMBEDDING_FUNCTION(
-                            query, user=user
-                        ),
-                        k=request.app.state.config.TOP_K,
-                        reranking_function=request.app.state.rf,
-                        r=request.app.state.config.RELEVANCE_THRESHOLD,
-                        hybrid_search=request.app.state.config.ENABLE_RAG_HYBRID_SEARCH,
-                        full_context=request.app.state.config.RAG_FULL_CONTEXT,
+            sources = await loop.run_in_executor(
+                RAG_SOURCES_EXECUTOR,
+                lambda: get_sources_from_files(
+                    request=request,
+                    files=files,
+                    queries=queries,
+                    embedding_function=lambda query: request.app.state.EMBEDDING_FUNCTION(
+                        query, user=user
                     ),
-                )
+                    k=request.app.state.config.TOP_K,
+                    reranking_function=request.app.state.rf,
+                    r=request.app.state.config.RELEVANCE_THRESHOLD,
+                    hybrid_search=request.app.state.config.ENABLE_RAG_HYBRID_SEARCH,
+                    full_context=request.app.state.config.RAG_FULL_CONTEXT,
+                ),
+            )
         except Exception as e:
             log.exception(e)
 